@@ -5,7 +5,7 @@ import sys
 import logging
 import traceback
 import GPUtil
-from transformers import MarianTokenizer, AutoConfig
+from transformers import AutoTokenizer, MarianTokenizer, AutoConfig
 from optimum.onnxruntime import ORTModelForSeq2SeqLM
 import onnxruntime as ort
 import warnings
@@ -20,6 +20,23 @@ warnings.filterwarnings("ignore", category=TracerWarning)
 logging.basicConfig(level=logging.DEBUG)  # Set to DEBUG for detailed logs
 logger = logging.getLogger('LoadModel')
 
+def load_tokenizer(model_dir):
+    """
+    Loads the tokenizer for a model, preferring the fast (Rust-backed) implementation
+    and falling back to the sentencepiece MarianTokenizer when none is available.
+    """
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(model_dir, use_fast=True)
+        if tokenizer.is_fast:
+            logger.info("Fast tokenizer loaded.")
+        else:
+            logger.info(f"No fast tokenizer available; using '{type(tokenizer).__name__}'.")
+        return tokenizer
+    except Exception as e:
+        logger.warning(f"Failed to load fast tokenizer for '{model_dir}': {e}. Falling back to MarianTokenizer.")
+        logger.debug(traceback.format_exc())
+        return MarianTokenizer.from_pretrained(model_dir)
+
 def load_translation_model(model_dir):
     try:
         # Detect GPU
@@ -57,7 +74,7 @@ def load_translation_model(model_dir):
         logger.info("Model loaded successfully.")
 
         # Load the tokenizer
-        tokenizer = MarianTokenizer.from_pretrained(model_dir)
+        tokenizer = load_tokenizer(model_dir)
         logger.info("Tokenizer loaded successfully.")
 
         # Retrieve available execution providers directly from onnxruntime
@@ -79,7 +96,7 @@ def load_translation_model(model_dir):
                     provider=provider,
                     use_cache=False  # Ensure use_cache=False here as well
                 )
-                tokenizer = MarianTokenizer.from_pretrained(model_dir)
+                tokenizer = load_tokenizer(model_dir)
                 logger.info(f"Successfully loaded model on CPU from '{model_dir}'.")
                 return model, tokenizer
             except Exception as ex:
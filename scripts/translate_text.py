@@ -4,65 +4,92 @@ import os
 import sys
 import logging
 import json
+import hashlib
 import traceback
 import srt
 from datetime import timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
-from transformers import MarianTokenizer
+import torch
 from optimum.onnxruntime import ORTModelForSeq2SeqLM
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('TranslateText')
 
-def translate_segment(segment, models, target_languages, translation_cache, use_profanity=False):
+def tokenizer_hash(tokenizer):
+    """
+    Fingerprints the source-side vocabulary of a tokenizer so that token ids can be
+    reused across runs and across target models that share a source vocabulary.
+    """
+    digest = hashlib.sha256(type(tokenizer).__name__.encode('utf-8'))
+    model_dir = getattr(tokenizer, 'name_or_path', '') or ''
+    hashed_files = False
+    for key, filename in sorted(getattr(tokenizer, 'vocab_files_names', {}).items()):
+        # Target-side vocabularies and tokenizer configs do not affect source token ids
+        if 'target' in key or key == 'tokenizer_config_file':
+            continue
+        path = os.path.join(model_dir, filename)
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+            hashed_files = True
+    if not hashed_files:
+        digest.update(json.dumps(tokenizer.get_vocab(), sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def tokenize_segments(transcript_segments, tokenizer, token_cache):
+    """
+    Batch-encodes all segment texts once, reusing token ids from the token cache where
+    the segment text is unchanged. Returns the token ids keyed by segment id and whether
+    the cache was updated.
+    """
+    key = tokenizer_hash(tokenizer)
+    cached = token_cache.setdefault(key, {})
+
+    token_ids = {}
+    pending = []
+    for segment in transcript_segments:
+        segment_id = str(segment['id'])
+        text = segment['text'].strip()
+        entry = cached.get(segment_id)
+        if entry is not None and entry.get('text') == text:
+            token_ids[segment_id] = entry['input_ids']
+        else:
+            pending.append((segment_id, text))
+
+    if not pending:
+        logger.info(f"Token ids for all {len(token_ids)} segments loaded from cache (tokenizer {key}).")
+        return token_ids, False
+
+    logger.info(f"Tokenizing {len(pending)} segments (tokenizer {key})...")
+    encoded = tokenizer([text for _, text in pending], truncation=True, max_length=512)['input_ids']
+    for (segment_id, text), input_ids in zip(pending, encoded):
+        cached[segment_id] = {'text': text, 'input_ids': list(input_ids)}
+        token_ids[segment_id] = cached[segment_id]['input_ids']
+    return token_ids, True
+
+def translate_segment(segment_id, input_ids, model, lang):
+    """
+    Generates the translation for a single pre-tokenized segment and returns the output
+    token ids, or None if generation failed.
+    """
     try:
-        index = segment['id'] + 1
-        start = timedelta(seconds=segment['start'])
-        end = timedelta(seconds=segment['end'])
-        original_text = segment['text'].strip()
-        segment_id = segment['id']
-
-        subtitles = {}
-        for lang in target_languages:
-            if lang in models:
-                model, tokenizer = models[lang]
-                # Check cache
-                if str(segment_id) in translation_cache and lang in translation_cache[str(segment_id)]:
-                    translated_text = translation_cache[str(segment_id)][lang]
-                else:
-                    # Perform translation
-                    try:
-                        inputs = tokenizer(original_text, return_tensors="pt")
-                        outputs = model.generate(**inputs, max_length=512, use_cache=False)
-                        translated_text = tokenizer.decode(outputs[0], skip_special_tokens=True).strip()
-                        # Update cache
-                        if str(segment_id) not in translation_cache:
-                            translation_cache[str(segment_id)] = {}
-                        translation_cache[str(segment_id)][lang] = translated_text
-                    except Exception as e:
-                        logger.error(f"Error translating segment {segment_id} to '{lang}': {e}")
-                        translated_text = "[Translation Error]"
-            else:
-                translated_text = "[Translation Not Available]"
-                logger.error(f"Translation model for '{lang}' is not loaded.")
-            
-            subtitle = srt.Subtitle(
-                index=index,
-                start=start,
-                end=end,
-                content=translated_text
-            )
-            subtitles[lang] = subtitle
-        return subtitles
+        input_tensor = torch.tensor([input_ids], dtype=torch.long)
+        outputs = model.generate(
+            input_ids=input_tensor,
+            attention_mask=torch.ones_like(input_tensor),
+            max_length=512,
+            use_cache=False
+        )
+        return outputs[0].tolist()
     except Exception as e:
-        logger.error(f"Error in translate_segment: {e}")
+        logger.error(f"Error translating segment {segment_id} to '{lang}': {e}")
         logger.debug(traceback.format_exc())
-        return {}
+        return None
 
-def translate_text(transcript_segments, models, target_languages, translation_cache_path, use_profanity=False):
+def translate_text(transcript_segments, models, target_languages, translation_cache_path, use_profanity=False, token_cache_path=None):
     try:
         # Load existing translation cache
         if os.path.exists(translation_cache_path):
@@ -72,25 +99,87 @@ def translate_text(transcript_segments, models, target_languages, translation_ca
         else:
             translation_cache = {}
 
-        translated_subtitles = {lang: [] for lang in target_languages}
+        # Load existing token cache
+        if token_cache_path and os.path.exists(token_cache_path):
+            with open(token_cache_path, 'r', encoding='utf-8') as f:
+                token_cache = json.load(f)
+            logger.info("Token cache loaded.")
+        else:
+            token_cache = {}
+
+        # Tokenize all segments once per distinct tokenizer
+        token_ids = {}
+        token_cache_updated = False
+        for lang in target_languages:
+            if lang not in models:
+                logger.error(f"Translation model for '{lang}' is not loaded.")
+                continue
+            _, tokenizer = models[lang]
+            cached_ids = next(
+                (token_ids[other] for other in token_ids if models[other][1] is tokenizer),
+                None
+            )
+            if cached_ids is None:
+                cached_ids, updated = tokenize_segments(transcript_segments, tokenizer, token_cache)
+                token_cache_updated = token_cache_updated or updated
+            token_ids[lang] = cached_ids
+
+        if token_cache_path and token_cache_updated:
+            os.makedirs(os.path.dirname(token_cache_path) or '.', exist_ok=True)
+            with open(token_cache_path, 'w', encoding='utf-8') as f:
+                json.dump(token_cache, f)
+            logger.info(f"Token cache updated at '{token_cache_path}'.")
+
+        # Generate translations for segments missing from the cache
+        jobs = [
+            (lang, str(segment['id']))
+            for lang in token_ids
+            for segment in transcript_segments
+            if lang not in translation_cache.get(str(segment['id']), {})
+        ]
+        generated = {lang: {} for lang in token_ids}
 
         logger.info("Translating segments...")
         with ThreadPoolExecutor() as executor:
             futures = {
                 executor.submit(
-                    translate_segment, 
-                    segment, 
-                    models, 
-                    target_languages, 
-                    translation_cache, 
-                    use_profanity
-                ): segment for segment in transcript_segments
+                    translate_segment,
+                    segment_id,
+                    token_ids[lang][segment_id],
+                    models[lang][0],
+                    lang
+                ): (lang, segment_id) for lang, segment_id in jobs
             }
 
             for future in tqdm(as_completed(futures), total=len(futures), desc="Translating", unit="segment"):
-                subtitles = future.result()
-                for lang, subtitle in subtitles.items():
-                    translated_subtitles[lang].append(subtitle)
+                lang, segment_id = futures[future]
+                generated[lang][segment_id] = future.result()
+
+        # Decode generated outputs in one batch per language and update the cache
+        for lang, outputs in generated.items():
+            decodable = [segment_id for segment_id, output_ids in outputs.items() if output_ids is not None]
+            if not decodable:
+                continue
+            _, tokenizer = models[lang]
+            texts = tokenizer.batch_decode([outputs[segment_id] for segment_id in decodable], skip_special_tokens=True)
+            for segment_id, text in zip(decodable, texts):
+                translation_cache.setdefault(segment_id, {})[lang] = text.strip()
+
+        # Build subtitles in segment order
+        translated_subtitles = {lang: [] for lang in target_languages}
+        for segment in transcript_segments:
+            segment_id = str(segment['id'])
+            for lang in target_languages:
+                if lang not in models:
+                    translated_text = "[Translation Not Available]"
+                else:
+                    translated_text = translation_cache.get(segment_id, {}).get(lang, "[Translation Error]")
+                translated_subtitles[lang].append(srt.Subtitle(
+                    index=segment['id'] + 1,
+                    start=timedelta(seconds=segment['start']),
+                    end=timedelta(seconds=segment['end']),
+                    content=translated_text
+                ))
 
         # Save updated translation cache
         with open(translation_cache_path, 'w', encoding='utf-8') as f:
@@ -138,5 +227,8 @@ if __name__ == "__main__":
     with open(transcript_cache_path, 'r', encoding='utf-8') as f:
         transcript_segments = json.load(f)
     
-    translate_text(transcript_segments, models, target_langs, translation_cache_path, use_profanity)
+    # Token ids are cached alongside the transcript so they can be shared across target models
+    token_cache_path = os.path.splitext(transcript_cache_path)[0] + '_tokens.json'
+
+    translate_text(transcript_segments, models, target_langs, translation_cache_path, use_profanity, token_cache_path)
     print("Translation completed successfully.")